@@ -1,30 +1,125 @@
 # generic_zero_shot_classifier.py
 from transformers import pipeline
+from contextlib import contextmanager
+import json
 import logging
+import math
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 class GenericZeroShotClassifier:
-    def __init__(self, model_path, device=-1):
+    def __init__(self, model_path, device=-1, batch_size=1, stats_file=None):
         """
         Initialize the zero-shot classifier with a specific model.
         
         Args:
             model_path (str): Path or ID of the model to use.
             device (int): Device to run on (-1 for CPU, 0 for GPU).
+            batch_size (int): Label hypotheses run through the model per forward pass.
+            stats_file (str): JSON file holding the label hit history used by
+                classify_early_exit. Loaded here, updated by save_label_stats().
         """
         logger.info(f"Loading zero-shot model from: {model_path}")
         try:
             self.classifier = pipeline(
                 "zero-shot-classification",
                 model=model_path,
-                device=device
+                device=device,
+                batch_size=batch_size
             )
             logger.info("Model loaded successfully.")
         except Exception as e:
             logger.error(f"Failed to load model: {e}")
             raise
 
+        self.batch_size = batch_size
+
+        # Per-label history for classify_early_exit: {label: [times_scored, times_cleared]}
+        self.stats_file = stats_file
+        try:
+            self.label_stats = self._read_label_stats()
+        except Exception as e:
+            logger.warning(f"Could not read label stats {self.stats_file}, starting with no history: {e}")
+            self.label_stats = {}
+        # Counts added since the last save; save_label_stats() adds them to the file's current counts
+        self._stats_delta = {}
+        self._stats_lock = threading.Lock()
+
+    def _read_label_stats(self):
+        # Raises on a corrupt file so a save never mistakes it for an empty history
+        if not self.stats_file or not os.path.exists(self.stats_file):
+            return {}
+        with open(self.stats_file, "r") as f:
+            return {label: list(counts) for label, counts in json.load(f).items()}
+
+    @contextmanager
+    def _stats_file_lock(self, timeout=10, stale_after=60):
+        # Lock file instead of fcntl/msvcrt so it works the same on Windows and Linux
+        lock_path = self.stats_file + ".lock"
+        deadline = time.time() + timeout
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > stale_after:
+                        os.remove(lock_path)  # left behind by a crashed process
+                        continue
+                except OSError:
+                    continue
+                if time.time() > deadline:
+                    raise TimeoutError(f"Timed out waiting for {lock_path}")
+                time.sleep(0.1)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.remove(lock_path)
+
+    def save_label_stats(self):
+        """
+        Add this run's label hit counts to stats_file (no-op without a stats_file).
+
+        The file is updated under a lock file and replaced atomically, so parallel
+        runs and workers add up their counts. If the lock can't be taken or the
+        file can't be read, the save is skipped and the counts are kept for the next one.
+        """
+        if not self.stats_file:
+            return
+        with self._stats_lock:
+            if not self._stats_delta:
+                return
+            tmp_path = f"{self.stats_file}.{os.getpid()}.tmp"
+            try:
+                with self._stats_file_lock():
+                    merged = self._read_label_stats()
+                    for label, (scored, cleared) in self._stats_delta.items():
+                        counts = merged.setdefault(label, [0, 0])
+                        counts[0] += scored
+                        counts[1] += cleared
+                    with open(tmp_path, "w") as f:
+                        json.dump(merged, f, indent=4)
+                    os.replace(tmp_path, self.stats_file)
+            except Exception as e:
+                logger.error(f"Skipped saving label stats {self.stats_file}: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return
+            self.label_stats = merged
+            self._stats_delta = {}
+
+    def _truncate(self, text):
+        # For very long articles, truncate to first ~1500 words to keep inference fast
+        # Most "topic" content is in the beginning anyway
+        words = text.split()
+        if len(words) > 1500:
+            text = " ".join(words[:1500])
+        return text
+
     def classify_article(self, text, candidate_labels, threshold=0.75, multi_label=False):
         """
         Classify text using the loaded zero-shot model.
@@ -43,11 +138,7 @@ class GenericZeroShotClassifier:
                 "raw_result": dict
             }
         """
-        # For very long articles, truncate to first ~1500 words to keep inference fast
-        # Most "topic" content is in the beginning anyway
-        words = text.split()
-        if len(words) > 1500:
-            text = " ".join(words[:1500])
+        text = self._truncate(text)
 
         result = self.classifier(
             text,
@@ -67,3 +158,105 @@ class GenericZeroShotClassifier:
             "all_scores": all_scores,
             "raw_result": result
         }
+
+    def _hit_rate(self, label):
+        scored, cleared = self.label_stats.get(label, (0, 0))
+        # Smoothed so unseen labels start in the middle instead of last
+        return (cleared + 1) / (scored + 2)
+
+    def classify_early_exit(self, text, label_groups, total_labels=None):
+        """
+        Score only the labels a decision needs, one forward pass per label, stopping early.
+
+        Each group is (labels, threshold) and is decided as soon as one of its labels
+        scores >= threshold. Labels are tried in order of historical hit rate, and
+        scoring stops once every group is decided. Labels that only belong to decided
+        groups are skipped. Every group gets at least one pass, so even a group with
+        threshold <= 0 reports a label. Scores match classify_article with
+        multi_label=True, since each label is scored independently there.
+
+        This gives up batching: a full classify_article run scores all labels in
+        ceil(total_labels / batch_size) forward passes, while this runs one pass per
+        scored label. It saves compute when batch_size is small (e.g. on CPU) but
+        can be slower than a batched full run.
+
+        The hit rate is kept in label_stats (persisted via stats_file). It is
+        conditional: a label tried later is only scored on rows where earlier labels
+        missed, so its rate understates how often it would match. Smoothing keeps
+        such labels from sinking to the bottom for good.
+
+        Args:
+            text (str): The text to classify.
+            label_groups (list): [(labels, threshold), ...], usually the positive
+                labels of each topic.
+            total_labels (int): Hypotheses a full multi_label run would score, used
+                for reporting. Defaults to the number of distinct labels.
+
+        Returns:
+            dict: {
+                "top_label": str,
+                "top_score": float,
+                "all_scores": dict (scored labels only),
+                "hypotheses_run": int,
+                "hypotheses_total": int,
+                "passes_run": int (forward passes, one per scored label),
+                "full_passes": int (forward passes of a batched full run)
+            }
+        """
+        text = self._truncate(text)
+
+        labels = []
+        for group_labels, _ in label_groups:
+            for label in group_labels:
+                if label not in labels:
+                    labels.append(label)
+        if total_labels is None:
+            total_labels = len(labels)
+
+        with self._stats_lock:
+            # sorted() is stable, so ties keep config order
+            order = sorted(labels, key=self._hit_rate, reverse=True)
+
+        decided = [False] * len(label_groups)
+        all_scores = {}
+        for label in order:
+            if all(decided):
+                break
+            if all(decided[i] or label not in group_labels for i, (group_labels, _) in enumerate(label_groups)):
+                continue
+
+            result = self.classifier(
+                text,
+                candidate_labels=[label],
+                hypothesis_template="This text is {}.",
+                multi_label=True
+            )
+            score = result["scores"][0]
+            all_scores[label] = score
+
+            cleared = False
+            for i, (group_labels, threshold) in enumerate(label_groups):
+                if label in group_labels and score >= threshold:
+                    decided[i] = True
+                    cleared = True
+            with self._stats_lock:
+                for table in (self.label_stats, self._stats_delta):
+                    stats = table.setdefault(label, [0, 0])
+                    stats[0] += 1
+                    stats[1] += int(cleared)
+
+        if all_scores:
+            top_label = max(all_scores, key=all_scores.get)
+            top_score = all_scores[top_label]
+        else:
+            top_label, top_score = "None", 0
+
+        return {
+            "top_label": top_label,
+            "top_score": top_score,
+            "all_scores": all_scores,
+            "hypotheses_run": len(all_scores),
+            "hypotheses_total": total_labels,
+            "passes_run": len(all_scores),
+            "full_passes": math.ceil(total_labels / self.batch_size)
+        }
@@ -7,11 +7,13 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import logging
 import random
+import os
 import cloudscraper
 import asyncio
 from playwright.async_api import async_playwright
 # Changed import to point to the renamed wrapper
 from classifier_wrapper import GenericZeroShotClassifier
+from topic_profiles import union_labels
 
 logger = logging.getLogger(__name__)
 
@@ -22,9 +24,37 @@ USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0",
 ]
 
+def build_validator(config, step):
+    """
+    Create an ArticleValidator from config.json settings.
+
+    Args:
+        config (dict): The loaded config.json.
+        step (str): "step1" or "step2". Early-exit hit history is kept per step
+            (e.g. label_stats_step2.json), since title/URL hits say little about
+            which labels match article bodies.
+    """
+    early_exit = config.get("early_exit_labels", False)
+    stats_file = None
+    if early_exit:
+        root, ext = os.path.splitext(config.get("label_stats_file", "label_stats.json"))
+        stats_file = f"{root}_{step}{ext or '.json'}"
+    return ArticleValidator(
+        config.get("model_path"),
+        device=config.get("device_id", -1),
+        early_exit=early_exit,
+        batch_size=config.get("batch_size", 1),
+        label_stats_file=stats_file
+    )
+
 class ArticleValidator:
-    def __init__(self, model_path, device=-1):
-        self.classifier = GenericZeroShotClassifier(model_path, device)
+    def __init__(self, model_path, device=-1, early_exit=False, batch_size=1, label_stats_file=None):
+        self.classifier = GenericZeroShotClassifier(
+            model_path, device, batch_size=batch_size, stats_file=label_stats_file
+        )
+        # Score only the positive labels and stop once the decision is fixed
+        # (see GenericZeroShotClassifier.classify_early_exit)
+        self.early_exit = early_exit
         self.timeout = 25
         self.max_retries = 2
 
@@ -98,62 +128,124 @@ class ArticleValidator:
         if soup.find("article") or soup.find("meta", property="og:type", content="article"): return True
         return len(soup.get_text(strip=True).split()) > 300
 
-    def validate_url(self, url, candidate_labels, positive_labels, threshold=0.60):
+    def extract_article_text(self, url):
         """
-        Validate a single URL against labels.
-        Returns: (status, top_label, score, list_label_scores, note)
+        Fetch a URL and extract its article text.
+        Returns: (text, reject_label, note)
+        text is None if the page was rejected; reject_label says why.
         """
         html, method = self.smart_fetch(url)
         if not html:
-            return "No", "None", 0, {}, f"Fetch Failed: {method}"
+            return None, "None", f"Fetch Failed: {method}"
 
         try:
             soup = BeautifulSoup(html, "html.parser")
             for s in soup(["script", "style"]): s.decompose()
             
             if not self.is_article(soup):
-                return "No", "Not Article", 0, {}, method
+                return None, "Not Article", method
             
             text = soup.get_text(separator=" ", strip=True)
             if len(text.split()) < 50:
-                return "No", "Too Short", 0, {}, method
-            
-            # Classify
-            result = self.classifier.classify_article(text, candidate_labels, threshold=threshold, multi_label=True)
-            all_scores = result["all_scores"]
-            
-            # Logic: Check if ANY positive label > threshold
-            is_relevant = False
-            top_pos_score = 0
-            best_label = result["top_label"] # Default to whatever machine thinks is top
-            
-            for label in positive_labels:
-                score = all_scores.get(label, 0)
-                if score >= threshold:
-                    is_relevant = True
-                    if score > top_pos_score:
-                        top_pos_score = score
-                        best_label = label
+                return None, "Too Short", method
             
-            status = "Yes" if is_relevant else "No"
-            final_score = top_pos_score if is_relevant else result["top_score"]
-            note = f"Label: {best_label} ({final_score:.2f}) | {method}"
+            return text, None, method
             
-            return status, best_label, final_score, all_scores, note
+        except Exception as e:
+            return None, "Error", f"Err: {e}"
+
+    def _passes_note(self, result):
+        return (
+            f"Hypotheses: {result['hypotheses_run']}/{result['hypotheses_total']}, "
+            f"forward passes: {result['passes_run']} (full run: {result['full_passes']})"
+        )
+
+    def _decide_relevance(self, all_scores, positive_labels, threshold, method):
+        """
+        Apply the Step 2 decision to a set of label scores.
+        Returns: (status, top_label, score, list_label_scores, note)
+        """
+        top_label = max(all_scores, key=all_scores.get) if all_scores else "None"
+        top_score = all_scores.get(top_label, 0)
+        
+        # Logic: Check if ANY positive label > threshold
+        is_relevant = False
+        top_pos_score = 0
+        best_label = top_label # Default to whatever machine thinks is top
+        
+        for label in positive_labels:
+            score = all_scores.get(label, 0)
+            if score >= threshold:
+                is_relevant = True
+                if score > top_pos_score:
+                    top_pos_score = score
+                    best_label = label
+        
+        status = "Yes" if is_relevant else "No"
+        final_score = top_pos_score if is_relevant else top_score
+        note = f"Label: {best_label} ({final_score:.2f}) | {method}"
+        
+        return status, best_label, final_score, all_scores, note
+
+    def validate_url(self, url, candidate_labels, positive_labels, threshold=0.60):
+        """
+        Validate a single URL against labels.
+        Returns: (status, top_label, score, list_label_scores, note)
+        """
+        text, reject_label, method = self.extract_article_text(url)
+        if text is None:
+            return "No", reject_label, 0, {}, method
+
+        try:
+            # Classify
+            if self.early_exit:
+                result = self.classifier.classify_early_exit(
+                    text, [(positive_labels, threshold)], total_labels=len(candidate_labels)
+                )
+                method = f"{method} | {self._passes_note(result)}"
+            else:
+                result = self.classifier.classify_article(text, candidate_labels, threshold=threshold, multi_label=True)
+            return self._decide_relevance(result["all_scores"], positive_labels, threshold, method)
             
         except Exception as e:
             return "No", "Error", 0, {}, f"Err: {e}"
 
-    def prefilter_metadata(self, title, url, candidate_labels, positive_labels, threshold_valid=0.85, threshold_invalid=0.30, force_valid_keywords=None):
+    def validate_url_topics(self, url, topics):
         """
-        Validate based on Title and URL only.
-        Returns: (status, best_label, score, note)
-        Status: 'Valid', 'Not Valid', 'Not Sure'
+        Validate a single URL against several topic profiles (see topic_profiles.py).
+        The page is fetched and parsed once, and the union of all topics' labels is
+        scored in one classifier call, batched by the classifier's batch_size.
+        With multi_label=True every label is scored independently, so each topic
+        gets the same scores a separate run would.
+        Returns: {topic_name: (status, top_label, score, list_label_scores, note)}
         """
-        # Combine text
-        text = f"{title} {url}"
-        
-        # 0. Check Keyword Overrides (Score Boost)
+        text, reject_label, method = self.extract_article_text(url)
+        if text is None:
+            return {t["name"]: ("No", reject_label, 0, {}, method) for t in topics}
+
+        try:
+            labels = union_labels(topics)
+            if self.early_exit:
+                result = self.classifier.classify_early_exit(
+                    text, [(t["positive_labels"], t["confidence_threshold"]) for t in topics],
+                    total_labels=len(labels)
+                )
+                method = f"{method} | {self._passes_note(result)}"
+            else:
+                result = self.classifier.classify_article(text, labels, threshold=0.0, multi_label=True)
+            all_scores = result["all_scores"]
+        except Exception as e:
+            return {t["name"]: ("No", "Error", 0, {}, f"Err: {e}") for t in topics}
+
+        results = {}
+        for topic in topics:
+            topic_scores = {label: all_scores[label] for label in topic["candidate_labels"] if label in all_scores}
+            results[topic["name"]] = self._decide_relevance(
+                topic_scores, topic["positive_labels"], topic["confidence_threshold"], method
+            )
+        return results
+
+    def _keyword_boost(self, text, force_valid_keywords):
         keyword_boost = 0.0
         matched_keywords = []
         if force_valid_keywords:
@@ -162,12 +254,14 @@ class ArticleValidator:
                 if kw.lower() in text_lower:
                     keyword_boost += 0.3
                     matched_keywords.append(kw)
-        
-        # Classify (using multi_label=True to get independent scores)
-        # We pass threshold=0 because we want to see the score regardless 
-        result = self.classifier.classify_article(text, candidate_labels, threshold=0.0, multi_label=True)
-        all_scores = result["all_scores"]
-        
+        # Round so 0.3 + 0.3 + 0.3 compares as 0.9 against the thresholds
+        return round(keyword_boost, 2), matched_keywords
+
+    def _decide_metadata(self, all_scores, positive_labels, threshold_valid, threshold_invalid, keyword_boost, matched_keywords):
+        """
+        Apply the Step 1 decision to a set of label scores.
+        Returns: (status, best_label, score, note)
+        """
         # Find the highest score among positive labels
         top_pos_score = 0
         best_label = "None"
@@ -179,12 +273,11 @@ class ArticleValidator:
                 best_label = label
         
         # If no positive label had a score > 0 (unlikely if model works), pick top overall
-        if top_pos_score == 0:
-             best_label = result["top_label"]
+        if top_pos_score == 0 and all_scores:
+             best_label = max(all_scores, key=all_scores.get)
              # If top label is not positive, score is effectively 0 for relevance
         
         # Apply Boost
-        original_score = top_pos_score
         top_pos_score = min(1.0, top_pos_score + keyword_boost)
         
         # Determine Status
@@ -200,3 +293,65 @@ class ArticleValidator:
             note += f" | Boosted +{keyword_boost:.1f} by {matched_keywords}"
         
         return status, best_label, top_pos_score, note
+
+    def prefilter_metadata(self, title, url, candidate_labels, positive_labels, threshold_valid=0.85, threshold_invalid=0.30, force_valid_keywords=None):
+        """
+        Validate based on Title and URL only.
+        Returns: (status, best_label, score, note)
+        Status: 'Valid', 'Not Valid', 'Not Sure'
+        """
+        # Combine text
+        text = f"{title} {url}"
+        
+        # 0. Check Keyword Overrides (Score Boost)
+        keyword_boost, matched_keywords = self._keyword_boost(text, force_valid_keywords)
+        
+        # Classify (using multi_label=True to get independent scores)
+        # We pass threshold=0 because we want to see the score regardless 
+        if self.early_exit:
+            # Once a positive label plus the boost reaches threshold_valid the status is "Valid"
+            result = self.classifier.classify_early_exit(
+                text, [(positive_labels, threshold_valid - keyword_boost)], total_labels=len(candidate_labels)
+            )
+        else:
+            result = self.classifier.classify_article(text, candidate_labels, threshold=0.0, multi_label=True)
+        
+        status, best_label, score, note = self._decide_metadata(
+            result["all_scores"], positive_labels, threshold_valid, threshold_invalid,
+            keyword_boost, matched_keywords
+        )
+        if self.early_exit:
+            note += f" | {self._passes_note(result)}"
+        return status, best_label, score, note
+
+    def prefilter_metadata_topics(self, title, url, topics):
+        """
+        Step 1 for several topic profiles: one classifier call over the union of labels,
+        then each topic applies its own keywords and thresholds.
+        Returns: {topic_name: (status, best_label, score, note)}
+        """
+        text = f"{title} {url}"
+        boosts = {t["name"]: self._keyword_boost(text, t["force_valid_keywords"]) for t in topics}
+        labels = union_labels(topics)
+        if self.early_exit:
+            result = self.classifier.classify_early_exit(
+                text,
+                [(t["positive_labels"], t["threshold_valid"] - boosts[t["name"]][0]) for t in topics],
+                total_labels=len(labels)
+            )
+        else:
+            result = self.classifier.classify_article(text, labels, threshold=0.0, multi_label=True)
+        all_scores = result["all_scores"]
+
+        results = {}
+        for topic in topics:
+            topic_scores = {label: all_scores[label] for label in topic["candidate_labels"] if label in all_scores}
+            keyword_boost, matched_keywords = boosts[topic["name"]]
+            status, best_label, score, note = self._decide_metadata(
+                topic_scores, topic["positive_labels"], topic["threshold_valid"], topic["threshold_invalid"],
+                keyword_boost, matched_keywords
+            )
+            if self.early_exit:
+                note += f" | {self._passes_note(result)}"
+            results[topic["name"]] = (status, best_label, score, note)
+        return results
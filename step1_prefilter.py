@@ -1,6 +1,7 @@
 import pandas as pd
 import logging
-from core_validator import ArticleValidator
+from core_validator import build_validator
+from topic_profiles import load_topic_profiles
 import json
 
 # CONFIG
@@ -25,20 +26,15 @@ def main():
 
     # Extract Config
     INPUT_FILE = config.get("input_file", "input_urls.xlsx")
-    OUTPUT_FILE = config.get("output_file_step1", "results_step1.xlsx")
-    MODEL_PATH = config.get("model_path")
-    DEVICE = config.get("device_id", -1)
     
-    CANDIDATE_LABELS = config.get("candidate_labels", [])
-    POSITIVE_LABELS = config.get("positive_labels", [])
-    
-    step1_config = config.get("step1_prefilter", {})
-    FORCE_VALID_KEYWORDS = step1_config.get("force_valid_keywords", [])
-    THRESHOLD_VALID = step1_config.get("threshold_valid", 0.85)
-    THRESHOLD_INVALID = step1_config.get("threshold_invalid", 0.30)
+    # One profile per topic; without a "topics" key this is just the top-level labels
+    TOPICS = load_topic_profiles(config)
+    if not TOPICS:
+        logger.error("No topic profiles loaded.")
+        return
     
     logger.info("Initializing Validator...")
-    validator = ArticleValidator(MODEL_PATH, device=DEVICE)
+    validator = build_validator(config, "step1")
     
     logger.info(f"Reading {INPUT_FILE}...")
     try:
@@ -55,40 +51,38 @@ def main():
         logger.error(f"Error reading file {INPUT_FILE}: {e}")
         return
 
-    results = []
+    results = {t["name"]: [] for t in TOPICS}
     logger.info(f"Processing {len(df)} items...")
     
     for index, row in df.iterrows():
         title = str(row["Title"])
         url = str(row["URL"])
         
-        status, label, score, note = validator.prefilter_metadata(
-            title, url, 
-            CANDIDATE_LABELS, POSITIVE_LABELS, 
-            threshold_valid=THRESHOLD_VALID, 
-            threshold_invalid=THRESHOLD_INVALID,
-            force_valid_keywords=FORCE_VALID_KEYWORDS
-        )
+        topic_results = validator.prefilter_metadata_topics(title, url, TOPICS)
         
-        results.append({
-            "Status": status,
-            "Meta-Label": label,
-            "Score": score,
-            "Note": note
-        })
+        for name, (status, label, score, note) in topic_results.items():
+            results[name].append({
+                "Status": status,
+                "Meta-Label": label,
+                "Score": score,
+                "Note": note
+            })
         
         if index % 10 == 0:
             logger.info(f"Processed {index + 1}/{len(df)}")
 
-    # Add results to DF
-    results_df = pd.DataFrame(results)
-    final_df = pd.concat([df, results_df], axis=1)
-    
-    try:
-        final_df.to_excel(OUTPUT_FILE, index=False)
-        logger.info(f"Saved results to {OUTPUT_FILE}")
-    except Exception as e:
-        logger.error(f"Failed to save results: {e}")
+    validator.classifier.save_label_stats()
+
+    # Add results to DF, one output file per topic
+    for topic in TOPICS:
+        results_df = pd.DataFrame(results[topic["name"]])
+        final_df = pd.concat([df, results_df], axis=1)
+        
+        try:
+            final_df.to_excel(topic["output_file_step1"], index=False)
+            logger.info(f"Saved {topic['name']} results to {topic['output_file_step1']}")
+        except Exception as e:
+            logger.error(f"Failed to save results: {e}")
 
 if __name__ == "__main__":
     main()
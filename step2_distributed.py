@@ -0,0 +1,174 @@
+import argparse
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from core_validator import build_validator
+# Importing step2_validate also sets the working directory and logging config
+from step2_validate import load_config, read_input_file, write_topic_results
+from topic_profiles import load_topic_profiles
+from work_queue import SQLiteWorkQueue
+
+logger = logging.getLogger(__name__)
+
+def get_queue(config):
+    dist_config = config.get("step2_distributed", {})
+    return SQLiteWorkQueue(
+        dist_config.get("queue_file", "work_queue.sqlite"),
+        lease_seconds=dist_config.get("lease_seconds", 300),
+        max_attempts=dist_config.get("max_attempts", 3)
+    )
+
+def run_coordinator(config, job_id):
+    """Read the input file and split it into URL shards in the work queue."""
+    df = read_input_file(config.get("input_file", "input_urls.xlsx"))
+    if df is None: return
+
+    shard_size = config.get("step2_distributed", {}).get("shard_size", 25)
+    queue = get_queue(config)
+    count = queue.create_job(job_id, df["URL"].astype(str).tolist(), shard_size=shard_size)
+    logger.info(f"Job '{job_id}' ready: {count} shards. Start workers with: python step2_distributed.py worker --job {job_id}")
+
+def _heartbeat_loop(queue, job_id, shard_id, lease_id, interval, stop, lost):
+    while not stop.wait(interval):
+        try:
+            if not queue.heartbeat(job_id, shard_id, lease_id):
+                logger.warning(f"Lost lease on shard {shard_id}, abandoning it")
+                lost.set()
+                return
+        except Exception as e:
+            # e.g. a lock timeout on a network share; try again next interval
+            logger.error(f"Heartbeat failed for shard {shard_id}: {e}")
+
+def run_worker(config, job_id, worker_id):
+    """Lease shards until the job has none left, validating each URL and writing results back."""
+    TOPICS = load_topic_profiles(config)
+    if not TOPICS:
+        logger.error("No topic profiles loaded.")
+        return
+
+    dist_config = config.get("step2_distributed", {})
+    HEARTBEAT_SECONDS = dist_config.get("heartbeat_seconds", 60)
+    POLL_SECONDS = dist_config.get("poll_seconds", 30)
+    MAX_WORKERS = config.get("step2_scraping", {}).get("max_workers", 4)
+    LEASE_SECONDS = dist_config.get("lease_seconds", 300)
+    if HEARTBEAT_SECONDS >= LEASE_SECONDS:
+        logger.error(f"heartbeat_seconds ({HEARTBEAT_SECONDS}) must be smaller than lease_seconds ({LEASE_SECONDS}).")
+        return
+
+    queue = get_queue(config)
+    logger.info(f"Worker {worker_id}: initializing Validator...")
+    validator = build_validator(config, "step2")
+
+    while True:
+        leased = queue.lease(job_id, worker_id)
+        if leased is None:
+            progress = queue.progress(job_id)
+            if not progress.get("pending") and not progress.get("leased"):
+                logger.info(f"Worker {worker_id}: job '{job_id}' has no work left {progress}")
+                return
+            # Remaining shards are leased by other workers; wait in case a lease expires
+            time.sleep(POLL_SECONDS)
+            continue
+
+        shard_id, lease_id, items = leased
+        logger.info(f"Worker {worker_id}: leased shard {shard_id} ({len(items)} URLs)")
+
+        stop = threading.Event()
+        lost = threading.Event()
+        heartbeat = threading.Thread(
+            target=_heartbeat_loop,
+            args=(queue, job_id, shard_id, lease_id, HEARTBEAT_SECONDS, stop, lost),
+            daemon=True
+        )
+        heartbeat.start()
+
+        results = []
+        try:
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                future_to_idx = {
+                    executor.submit(validator.validate_url_topics, url, TOPICS): idx
+                    for idx, url in items
+                }
+                for future in as_completed(future_to_idx):
+                    if lost.is_set():
+                        # Another worker owns the shard now; drop URLs not started yet
+                        for pending in future_to_idx:
+                            pending.cancel()
+                        break
+                    idx = future_to_idx[future]
+                    try:
+                        for name, (status, label, score, _, note) in future.result().items():
+                            results.append((idx, name, status, label, score, note))
+                    except Exception as e:
+                        logger.error(f"Error on index {idx}: {e}")
+                        results.extend((idx, t["name"], "No", "Error", 0, str(e)) for t in TOPICS)
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        if lost.is_set():
+            logger.warning(f"Worker {worker_id}: skipped shard {shard_id} after losing its lease")
+            continue
+        if queue.complete(job_id, shard_id, lease_id, results):
+            logger.info(f"Worker {worker_id}: finished shard {shard_id}")
+        validator.classifier.save_label_stats()
+
+def run_merge(config, job_id):
+    """Build the per-topic Step 2 output files from the results in the work queue."""
+    TOPICS = load_topic_profiles(config)
+    if not TOPICS:
+        logger.error("No topic profiles loaded.")
+        return
+
+    df = read_input_file(config.get("input_file", "input_urls.xlsx"))
+    if df is None: return
+
+    queue = get_queue(config)
+    # Results are stored by row index, so the input file must still match the job
+    job_urls = queue.job_urls(job_id)
+    input_urls = df["URL"].astype(str).tolist()
+    if len(job_urls) != len(input_urls):
+        logger.error(f"Job '{job_id}' has {len(job_urls)} URLs but {len(df)} rows are in the input file; refusing to merge.")
+        return
+    mismatched = [idx for idx, url in job_urls.items() if input_urls[idx] != url]
+    if mismatched:
+        logger.error(f"Job '{job_id}' URLs differ from the input file at rows {mismatched[:10]}; refusing to merge.")
+        return
+
+    progress = queue.progress(job_id)
+    if progress.get("pending") or progress.get("leased"):
+        logger.warning(f"Job '{job_id}' is not finished {progress}; unprocessed rows are marked 'Not Processed'")
+    if progress.get("failed"):
+        logger.warning(f"Job '{job_id}' has {progress['failed']} failed shards")
+
+    results_map = {
+        idx: {name: (status, label, note) for name, (status, label, _, note) in topic_results.items()}
+        for idx, topic_results in queue.fetch_results(job_id).items()
+    }
+    write_topic_results(df, results_map, TOPICS)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Step 2 across several machines through a shared work queue.")
+    parser.add_argument("command", choices=["coordinator", "worker", "merge", "status"])
+    parser.add_argument("--job", default="default", help="Job id (default: 'default')")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}", help="Worker name used for leases")
+    args = parser.parse_args()
+
+    config = load_config()
+    if not config: return
+
+    if args.command == "coordinator":
+        run_coordinator(config, args.job)
+    elif args.command == "worker":
+        run_worker(config, args.job, args.worker_id)
+    elif args.command == "merge":
+        run_merge(config, args.job)
+    else:
+        logger.info(f"Job '{args.job}': {get_queue(config).progress(args.job)}")
+
+if __name__ == "__main__":
+    main()
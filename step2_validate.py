@@ -1,7 +1,8 @@
 import pandas as pd
 import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from core_validator import ArticleValidator
+from core_validator import build_validator
+from topic_profiles import load_topic_profiles
 import json
 
 # CONFIG
@@ -20,6 +21,38 @@ def load_config():
         logger.error(f"Error loading config: {e}")
         return None
 
+def read_input_file(input_file):
+    logger.info(f"Reading {input_file}...")
+    try:
+        df = pd.read_excel(input_file)
+        if "URL" not in df.columns:
+             df.columns = ["URL"] if len(df.columns) == 1 else ["URL"] + list(df.columns[1:])
+        return df
+    except Exception as e:
+        logger.error(f"Error reading file: {e}")
+        return None
+
+def write_topic_results(df, results_map, topics):
+    """
+    Write one Step 2 output file per topic.
+    results_map: {row_index: {topic_name: (status, label, note)}}
+    """
+    for topic in topics:
+        is_rel, labels, notes = [], [], []
+        for i in range(len(df)):
+            res = results_map.get(i, {}).get(topic["name"], ("No", "Not Processed", ""))
+            is_rel.append(res[0])
+            labels.append(res[1])
+            notes.append(res[2])
+            
+        topic_df = df.copy()
+        topic_df["Is Relevant"] = is_rel
+        topic_df["Topic"] = labels
+        topic_df["Notes"] = notes
+        
+        topic_df.to_excel(topic["output_file_step2"], index=False)
+        logger.info(f"Saved {topic['name']} to {topic['output_file_step2']}")
+
 def main():
     config = load_config()
     if not config: return
@@ -32,16 +65,14 @@ def main():
     # For this handover, let's stick to the explicit input file defined for step 2 in case they run independently
     # or just reuse the main input file.
     INPUT_FILE = config.get("input_file", "input_urls.xlsx")
-    OUTPUT_FILE = config.get("output_file_step2", "results_step2.xlsx")
-    
-    MODEL_PATH = config.get("model_path")
-    DEVICE = config.get("device_id", -1)
     
-    CANDIDATE_LABELS = config.get("candidate_labels", [])
-    POSITIVE_LABELS = config.get("positive_labels", [])
+    # One profile per topic; without a "topics" key this is just the top-level labels
+    TOPICS = load_topic_profiles(config)
+    if not TOPICS:
+        logger.error("No topic profiles loaded.")
+        return
     
     scraping_config = config.get("step2_scraping", {})
-    CONFIDENCE_THRESHOLD = scraping_config.get("confidence_threshold", 0.60)
     MAX_WORKERS = scraping_config.get("max_workers", 4)
     # Timeout is handled in core_validator, passed via property or init? 
     # core_validator currently accepts timeout in init? No, it hardcodes self.timeout=25.
@@ -49,16 +80,10 @@ def main():
     # or assume the engineer will modify core logic if they need deep timeout changes.
     
     logger.info("Initializing Validator...")
-    validator = ArticleValidator(MODEL_PATH, device=DEVICE)
+    validator = build_validator(config, "step2")
     
-    logger.info(f"Reading {INPUT_FILE}...")
-    try:
-        df = pd.read_excel(INPUT_FILE)
-        if "URL" not in df.columns:
-             df.columns = ["URL"] if len(df.columns) == 1 else ["URL"] + list(df.columns[1:])
-    except Exception as e:
-        logger.error(f"Error reading file: {e}")
-        return
+    df = read_input_file(INPUT_FILE)
+    if df is None: return
 
     urls = df["URL"].astype(str).tolist()
     results_map = {}
@@ -68,11 +93,9 @@ def main():
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         future_to_idx = {
             executor.submit(
-                validator.validate_url, 
+                validator.validate_url_topics, 
                 url, 
-                CANDIDATE_LABELS, 
-                POSITIVE_LABELS, 
-                CONFIDENCE_THRESHOLD
+                TOPICS
             ): idx 
             for idx, url in enumerate(urls)
         }
@@ -80,27 +103,18 @@ def main():
         for future in as_completed(future_to_idx):
             idx = future_to_idx[future]
             try:
-                status, label, score, _, note = future.result()
-                results_map[idx] = (status, label, note)
+                topic_results = future.result()
+                results_map[idx] = {
+                    name: (status, label, note)
+                    for name, (status, label, score, _, note) in topic_results.items()
+                }
                 if idx % 5 == 0: logger.info(f"Processed {idx}")
             except Exception as e:
                 logger.error(f"Error on index {idx}: {e}")
-                results_map[idx] = ("No", "Error", str(e))
-    
-    # Assemble results
-    is_rel, topics, notes = [], [], []
-    for i in range(len(df)):
-        res = results_map.get(i, ("No", "Not Processed", ""))
-        is_rel.append(res[0])
-        topics.append(res[1])
-        notes.append(res[2])
-        
-    df["Is Relevant"] = is_rel
-    df["Topic"] = topics
-    df["Notes"] = notes
+                results_map[idx] = {t["name"]: ("No", "Error", str(e)) for t in TOPICS}
     
-    df.to_excel(OUTPUT_FILE, index=False)
-    logger.info(f"Saved to {OUTPUT_FILE}")
+    validator.classifier.save_label_stats()
+    write_topic_results(df, results_map, TOPICS)
 
 if __name__ == "__main__":
     main()
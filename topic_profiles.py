@@ -0,0 +1,144 @@
+# topic_profiles.py
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _profile_name(path):
+    # "clients/acme/config.json" -> "acme", "acme.json" -> "acme"
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if stem == "config":
+        parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        if parent:
+            return parent
+    return stem
+
+
+def _suffixed(filename, name):
+    root, ext = os.path.splitext(filename)
+    return f"{root}_{name}{ext or '.xlsx'}"
+
+
+def build_profile(topic_config, defaults, name=None):
+    """
+    Normalize one topic config into a flat profile dict.
+
+    Args:
+        topic_config (dict): Topic settings, same shape as config.json
+            (candidate_labels, positive_labels, step1_prefilter, step2_scraping).
+        defaults (dict): The main config, used for any setting the topic omits.
+        name (str): Topic name. If None, a single unnamed profile is built and
+            the output files are not suffixed. Otherwise the main config's output
+            files get a "_<name>" suffix unless topic_config sets its own.
+
+    Returns:
+        dict: {
+            "name": str,
+            "candidate_labels": list,
+            "positive_labels": list,
+            "force_valid_keywords": list,
+            "threshold_valid": float,
+            "threshold_invalid": float,
+            "confidence_threshold": float,
+            "output_file_step1": str,
+            "output_file_step2": str
+        }
+    """
+    step1_default = defaults.get("step1_prefilter", {})
+    step2_default = defaults.get("step2_scraping", {})
+    step1_config = topic_config.get("step1_prefilter", {})
+    step2_config = topic_config.get("step2_scraping", {})
+
+    candidate_labels = topic_config.get("candidate_labels", defaults.get("candidate_labels", []))
+    positive_labels = topic_config.get("positive_labels", defaults.get("positive_labels", []))
+    missing = [label for label in positive_labels if label not in candidate_labels]
+    # Only named topics are patched; the single default profile keeps the config as-is
+    if missing and name is not None:
+        logger.warning(f"Topic '{name}': positive labels {missing} not in candidate_labels, adding them.")
+        candidate_labels = list(candidate_labels) + missing
+
+    output_step1 = defaults.get("output_file_step1", "results_step1.xlsx")
+    output_step2 = defaults.get("output_file_step2", "results_step2.xlsx")
+    if name is not None:
+        output_step1 = _suffixed(output_step1, name)
+        output_step2 = _suffixed(output_step2, name)
+
+    return {
+        "name": name or "default",
+        "candidate_labels": list(candidate_labels),
+        "positive_labels": list(positive_labels),
+        "force_valid_keywords": step1_config.get("force_valid_keywords", step1_default.get("force_valid_keywords", [])),
+        "threshold_valid": step1_config.get("threshold_valid", step1_default.get("threshold_valid", 0.85)),
+        "threshold_invalid": step1_config.get("threshold_invalid", step1_default.get("threshold_invalid", 0.30)),
+        "confidence_threshold": step2_config.get("confidence_threshold", step2_default.get("confidence_threshold", 0.60)),
+        "output_file_step1": topic_config.get("output_file_step1", output_step1),
+        "output_file_step2": topic_config.get("output_file_step2", output_step2),
+    }
+
+
+def load_topic_profiles(config):
+    """
+    Build the list of topic profiles for a run.
+
+    If config.json has no "topics" key, the top-level labels and thresholds form a
+    single profile and the output files are unchanged. Otherwise each entry in
+    "topics" is either a path to another config.json (e.g. one generated per client
+    by config_generator.py) or an inline dict with the same fields plus "name".
+    Output file names in a topic loaded from a path are ignored, since configs saved
+    by config_gui.py carry the main config's names; those topics always get the
+    suffixed names.
+
+    Returns:
+        list: Profile dicts, see build_profile. Empty if two topics would write
+        to the same output file.
+    """
+    topics = config.get("topics")
+    if not topics:
+        return [build_profile(config, config)]
+
+    profiles = []
+    seen = set()
+    for entry in topics:
+        if isinstance(entry, str):
+            try:
+                with open(entry, "r") as f:
+                    topic_config = json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading topic config {entry}: {e}")
+                continue
+            name = topic_config.get("name", _profile_name(entry))
+            topic_config = {k: v for k, v in topic_config.items() if k not in ("output_file_step1", "output_file_step2")}
+        else:
+            topic_config = entry
+            name = topic_config.get("name", f"topic{len(profiles) + 1}")
+
+        if name in seen:
+            logger.warning(f"Duplicate topic name '{name}', skipping.")
+            continue
+        seen.add(name)
+        profiles.append(build_profile(topic_config, config, name=name))
+
+    # Refuse to run rather than let one topic overwrite another's results
+    for key in ("output_file_step1", "output_file_step2"):
+        owners = {}
+        for profile in profiles:
+            owners.setdefault(os.path.abspath(profile[key]), []).append(profile["name"])
+        clashes = {path: names for path, names in owners.items() if len(names) > 1}
+        if clashes:
+            logger.error(f"Topics share an output file ({key}): {clashes}")
+            return []
+
+    logger.info(f"Loaded {len(profiles)} topic profiles: {[p['name'] for p in profiles]}")
+    return profiles
+
+
+def union_labels(profiles, key="candidate_labels"):
+    """Ordered, de-duplicated union of a label list across profiles."""
+    labels = []
+    for profile in profiles:
+        for label in profile[key]:
+            if label not in labels:
+                labels.append(label)
+    return labels
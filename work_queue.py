@@ -0,0 +1,239 @@
+# work_queue.py
+import json
+import sqlite3
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    job_id TEXT NOT NULL,
+    shard_id INTEGER NOT NULL,
+    items TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker_id TEXT,
+    lease_id TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, shard_id)
+);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT NOT NULL,
+    row_idx INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    status TEXT,
+    label TEXT,
+    score REAL,
+    note TEXT,
+    PRIMARY KEY (job_id, row_idx, topic)
+);
+"""
+
+
+class SQLiteWorkQueue:
+    """
+    Lease-based work queue for Step 2, stored in a single SQLite file.
+
+    A job is a list of (row_index, url) items split into shards. Workers lease a
+    shard for a fixed time, renew the lease with heartbeat() while they work, and
+    hand results back with complete(). A shard whose lease runs out (worker died,
+    machine lost network) is handed to the next worker that asks.
+
+    Every lease gets a fresh lease_id. heartbeat() and complete() only act on the
+    shard while it still carries that id, so a worker whose shard was reassigned,
+    or whose job was re-created by the coordinator, cannot overwrite it.
+
+    Shard states: 'pending', 'leased', 'done', 'failed'.
+    """
+
+    def __init__(self, path, lease_seconds=300, max_attempts=3):
+        """
+        Args:
+            path (str): SQLite file shared by the coordinator and all workers.
+            lease_seconds (int): How long a lease lasts without a heartbeat.
+            max_attempts (int): Leases per shard before it is marked 'failed'.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # One connection per call so heartbeat threads never share a connection
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return _Connection(conn)
+
+    def create_job(self, job_id, urls, shard_size=25):
+        """
+        Split a URL list into shards. Replaces any existing job with the same id.
+
+        Returns:
+            int: Number of shards created.
+        """
+        items = list(enumerate(urls))
+        shards = [items[i:i + shard_size] for i in range(0, len(items), shard_size)]
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM shards WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+            conn.executemany(
+                "INSERT INTO shards (job_id, shard_id, items) VALUES (?, ?, ?)",
+                [(job_id, shard_id, json.dumps(shard)) for shard_id, shard in enumerate(shards)]
+            )
+            conn.execute("COMMIT")
+        logger.info(f"Job '{job_id}': {len(items)} URLs in {len(shards)} shards")
+        return len(shards)
+
+    def lease(self, job_id, worker_id):
+        """
+        Lease the next pending or expired shard.
+
+        Returns:
+            tuple: (shard_id, lease_id, [(row_index, url), ...]) or None if nothing is available.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Expired shards that have used up their attempts are given up on.
+            # lease_id is kept so the last worker can still hand in its results.
+            conn.execute(
+                "UPDATE shards SET state = 'failed', lease_expires = NULL "
+                "WHERE job_id = ? AND state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (job_id, now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT shard_id, items, state, worker_id FROM shards "
+                "WHERE job_id = ? AND (state = 'pending' OR (state = 'leased' AND lease_expires < ?)) "
+                "ORDER BY attempts, shard_id LIMIT 1",
+                (job_id, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            shard_id, items, state, previous_worker = row
+            lease_id = uuid.uuid4().hex
+            conn.execute(
+                "UPDATE shards SET state = 'leased', worker_id = ?, lease_id = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE job_id = ? AND shard_id = ?",
+                (worker_id, lease_id, now + self.lease_seconds, job_id, shard_id)
+            )
+            conn.execute("COMMIT")
+
+        if state == "leased":
+            logger.warning(f"Shard {shard_id}: lease of {previous_worker} expired, reassigned to {worker_id}")
+        return shard_id, lease_id, [tuple(item) for item in json.loads(items)]
+
+    def heartbeat(self, job_id, shard_id, lease_id):
+        """
+        Extend a lease.
+
+        A shard marked 'failed' after this lease still counts as held: it will not
+        be re-leased, and complete() accepts its results.
+
+        Returns:
+            bool: False if the lease was lost (expired and taken by another worker).
+        """
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE shards SET lease_expires = ? "
+                "WHERE job_id = ? AND shard_id = ? AND state = 'leased' AND lease_id = ?",
+                (time.time() + self.lease_seconds, job_id, shard_id, lease_id)
+            )
+            if cur.rowcount == 1:
+                return True
+            return conn.execute(
+                "SELECT 1 FROM shards WHERE job_id = ? AND shard_id = ? AND state = 'failed' AND lease_id = ?",
+                (job_id, shard_id, lease_id)
+            ).fetchone() is not None
+
+    def complete(self, job_id, shard_id, lease_id, results):
+        """
+        Store results for a shard and mark it done.
+
+        Results are only accepted while the shard still carries this lease_id, either
+        still leased (even if expired but not yet re-leased) or marked 'failed' after
+        this lease. Otherwise they are dropped.
+
+        Args:
+            results (list): [(row_index, topic, status, label, score, note), ...]
+
+        Returns:
+            bool: False if the lease was lost and the results were dropped.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            held = conn.execute(
+                "SELECT 1 FROM shards WHERE job_id = ? AND shard_id = ? "
+                "AND state IN ('leased', 'failed') AND lease_id = ?",
+                (job_id, shard_id, lease_id)
+            ).fetchone() is not None
+            if not held:
+                conn.execute("COMMIT")
+                logger.warning(f"Shard {shard_id}: lease {lease_id} was lost, dropping its results")
+                return False
+            conn.executemany(
+                "INSERT OR REPLACE INTO results (job_id, row_idx, topic, status, label, score, note) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(job_id,) + tuple(r) for r in results]
+            )
+            conn.execute(
+                "UPDATE shards SET state = 'done', lease_expires = NULL WHERE job_id = ? AND shard_id = ?",
+                (job_id, shard_id)
+            )
+            conn.execute("COMMIT")
+        return True
+
+    def job_urls(self, job_id):
+        """
+        Returns:
+            dict: {row_index: url} for every item the job was created with.
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT items FROM shards WHERE job_id = ?", (job_id,)).fetchall()
+        return {idx: url for (items,) in rows for idx, url in json.loads(items)}
+
+    def progress(self, job_id):
+        """
+        Returns:
+            dict: {state: shard_count}
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT state, COUNT(*) FROM shards WHERE job_id = ? GROUP BY state", (job_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def fetch_results(self, job_id):
+        """
+        Returns:
+            dict: {row_index: {topic: (status, label, score, note)}}
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT row_idx, topic, status, label, score, note FROM results WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        results = {}
+        for row_idx, topic, status, label, score, note in rows:
+            results.setdefault(row_idx, {})[topic] = (status, label, score, note)
+        return results
+
+
+class _Connection:
+    """Context manager that rolls back an open transaction on error and always closes."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.conn.in_transaction:
+            self.conn.execute("ROLLBACK")
+        self.conn.close()
+        return False